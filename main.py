@@ -3,13 +3,21 @@ import asyncio
 import random
 import sys
 import json
+import csv
+import io
+import base64
+import re
 import logging
+import logging.handlers
+import queue
+import atexit
 import platform
 import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from threading import Thread
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Flask, render_template, request, redirect, url_for, jsonify, Response, stream_with_context
 
 # --- TELETHON & SUPABASE ---
 from telethon import TelegramClient, events, errors, utils, functions, types
@@ -21,16 +29,90 @@ from supabase import create_client, Client
 # KONFIGURASI SISTEM & LOGGING
 # ==========================================
 
-# Format logging yang lebih detail untuk debugging level dewa
-logging.basicConfig(
-    format='[%(levelname)s] %(asctime)s - %(name)s - %(funcName)s:%(lineno)d - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        # Opsional: FileHandler jika ingin menyimpan log ke file
-        # logging.FileHandler("bot_activity.log") 
-    ]
-)
+# Opsi Logging (via ENV)
+LOG_JSON = os.getenv('LOG_JSON', '0') == '1'           # Output JSON per baris (structured)
+LOG_CALLER = os.getenv('LOG_CALLER', '0') == '1'       # funcName:lineno (mahal, untuk debugging)
+LOG_SAMPLE_WINDOW = 60         # Detik per jendela sampling log berulang
+LOG_SAMPLE_BURST = 20          # Maksimal log INFO dengan template sama per jendela
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler tanpa formatting di thread pemanggil.
+    Pesan %-style baru dirangkai oleh QueueListener di thread terpisah,
+    jadi hot path hanya membayar biaya put ke antrian.
+    """
+    def prepare(self, record):
+        return record
+
+class RepeatSampler(logging.Filter):
+    """
+    Rate-limit log INFO/DEBUG berulang per template pesan (record.msg).
+    Log WARNING ke atas selalu lolos.
+    """
+    def __init__(self, window, burst):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.counters = {}  # Format: {template: [window_start, count]}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+        key = (record.name, record.msg)
+        counter = self.counters.get(key)
+        if counter is None and len(self.counters) >= 2000:
+            # Buang template kadaluarsa agar pesan unik (f-string) tidak menumpuk di memori
+            self.counters = {k: c for k, c in self.counters.items() if now - c[0] < self.window}
+        if counter is None or now - counter[0] >= self.window:
+            suppressed = counter[1] - self.burst if counter else 0
+            self.counters[key] = [now, 1]
+            if suppressed > 0:
+                record.msg = f"{record.msg} (+{suppressed} log serupa disembunyikan)"
+            return True
+        counter[1] += 1
+        return counter[1] <= self.burst
+
+class JsonFormatter(logging.Formatter):
+    """Formatter JSON satu baris per record (untuk log collector)."""
+    def format(self, record):
+        data = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if LOG_CALLER:
+            data["func"] = f"{record.funcName}:{record.lineno}"
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+# Lookup caller (funcName/lineno) dilakukan per record oleh modul logging; matikan jika tidak dipakai
+if not LOG_CALLER:
+    logging._srcfile = None
+
+if LOG_JSON:
+    log_formatter = JsonFormatter()
+elif LOG_CALLER:
+    log_formatter = logging.Formatter('[%(levelname)s] %(asctime)s - %(name)s - %(funcName)s:%(lineno)d - %(message)s')
+else:
+    log_formatter = logging.Formatter('[%(levelname)s] %(asctime)s - %(name)s - %(message)s')
+
+stdout_handler = logging.StreamHandler(sys.stdout)
+stdout_handler.setFormatter(log_formatter)
+# Opsional: FileHandler jika ingin menyimpan log ke file
+# file_handler = logging.FileHandler("bot_activity.log")
+
+# Pipeline: logger -> AsyncQueueHandler (hot path) -> QueueListener thread -> stdout
+log_queue = queue.SimpleQueue()
+queue_handler = AsyncQueueHandler(log_queue)
+queue_handler.addFilter(RepeatSampler(LOG_SAMPLE_WINDOW, LOG_SAMPLE_BURST))
+log_listener = logging.handlers.QueueListener(log_queue, stdout_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
 logger = logging.getLogger("BabaBot_Ultimate")
 
 # Load Environment Variables
@@ -77,30 +159,89 @@ AUTO_REPLY_MSG = (
     "[KLIK DISINI YA KAK](https://babaparfume.netlify.app)"
 )
 AUTO_REPLY_DELAY_HOURS = 6     # Jeda waktu auto-reply ke user yang sama agar tidak spam
+SENDER_CACHE_MAX = 5000        # Maksimal pengirim DM yang disimpan di cache lokal
+SENDER_CACHE_TTL_SECONDS = 3600 # Cache pengirim kadaluarsa agar perubahan nama/username ikut ke CRM
 DB_UPDATE_INTERVAL_HOURS = 1   # Jeda update data user ke DB (CRM optimization)
 TIMEZONE_OFFSET = 7            # WIB (UTC+7)
 LOG_RETENTION_DAYS = 7         # Berapa hari log disimpan di DB sebelum dihapus otomatis
 
+# Broadcast Segmentasi
+BROADCAST_BATCH_SIZE = 40          # Default jumlah user per batch
+BROADCAST_BATCH_REST_SECONDS = 150 # Default istirahat antar batch (Anti-Ban)
+DB_PAGE_SIZE = 1000                # Ukuran halaman query keyset ke Supabase
+API_PAGE_LIMIT_MAX = 500           # Batas maksimal `limit` pada API browsing log/CRM
+# Filter status log yang diizinkan -> prefix status di DB ("SUCCESS" juga cocok "SUCCESS (RETRY)")
+LOG_STATUS_FILTERS = {"SUCCESS": "SUCCESS", "FAILED": "FAILED", "FLOODWAIT": "FLOODWAIT", "WAIT": "FLOODWAIT", "UNKNOWN": "UNKNOWN"}
+
+# Pre-Warm Blast Terjadwal
+BLAST_PREWARM_MINUTES = 3      # Mulai warm-up (koneksi, entity, pesan sumber) sebelum jadwal
+BLAST_PLAN_TTL_SECONDS = 600   # Plan hasil warm-up dianggap basi setelah ini
+
+# Auto Reply Worker Pool
+AUTO_REPLY_WORKERS = 3         # Jumlah worker balasan paralel (tetap, tidak ikut burst)
+AUTO_REPLY_QUEUE_SIZE = 500    # Batas antrian user yang menunggu balasan
+AUTO_REPLY_STALE_SECONDS = 600 # Balasan yang antri lebih lama dari ini dibuang
+
+# Rate Limit Pengiriman (dipakai bersama: blast, broadcast, auto-reply)
+SEND_RATE_PER_SECOND = 1.0     # Rata-rata pesan keluar per detik
+SEND_BURST = 3                 # Maksimal pesan beruntun tanpa jeda
+
+# Connection Supervisor
+CONN_CHECK_SECONDS = 5         # Interval cek koneksi (juga langsung bangun saat disconnect)
+CONN_PROBE_SECONDS = 60        # Interval probe aktif ke server Telegram
+CONN_PROBE_TIMEOUT = 10        # Probe lebih lama dari ini dianggap koneksi mati
+RECONNECT_BACKOFF_MAX = 60     # Batas atas jeda exponential backoff reconnect
+
+# Leader Election (Multi Replica)
+INSTANCE_ID = os.getenv('INSTANCE_ID') or f"{platform.node()}-{os.getpid()}"
+LEADER_LEASE_NAME = "blast_scheduler"
+LEADER_LEASE_SECONDS = 30      # Lease kadaluarsa jika leader tidak memperpanjang
+LEADER_RENEW_SECONDS = 10      # Interval perpanjangan / percobaan ambil alih lease
+
 # ==========================================
 # GLOBAL VARIABLES & STATE MANAGEMENT
 # ==========================================
+# Auto-reconnect Telethon tetap aktif (request pending dikirim ulang oleh Telethon sendiri).
+# connection_supervisor memantau, menahan pipeline kirim, dan reconnect jika Telethon menyerah.
 client = TelegramClient(StringSession(STRING_SESSION), API_ID, API_HASH)
 
 # Cache Memory untuk mengurangi beban Database
 last_replies = {}     # Format: {user_id: datetime}
 user_db_cache = {}    # Format: {user_id: datetime}
+sender_cache = OrderedDict()  # Format: {user_id: {id, username, first_name, bot, cached_at}} (LRU + TTL)
+pending_replies = {}  # Format: {user_id: (event, datetime)} (coalescing per user)
+replying_users = set()  # User yang balasannya sedang diproses worker (typing/kirim)
+auto_reply_queue = None  # asyncio.Queue, dibuat saat loop bot berjalan
 start_time = time.time() # Untuk menghitung Uptime
 
 # Event Loop Reference
 BOT_LOOP = None
 
+# Connection State (TG_READY di-set saat Telegram siap kirim, dibuat saat loop bot berjalan)
+TG_READY = None
+CONN_DOWN_SINCE = None   # time.monotonic() saat koneksi terakhir putus (None = terhubung)
+CONN_META = {
+    "connected": False,
+    "reconnect_count": 0,
+    "last_disconnect": None,
+    "last_reconnect_seconds": None,
+    "total_downtime_seconds": 0.0
+}
+
 # Broadcast Flags
 BROADCAST_RUNNING = False 
 
+# Leader Flag (Hanya leader yang menjalankan jadwal blast & broadcast)
+IS_LEADER = False
+LEADER_LEASE_EXPIRES = None   # time.monotonic() batas lokal lease milik instance ini
+
 # Blast State Machine (Advanced Control)
 # Options: IDLE, RUNNING, PAUSED, STOPPED
 BLAST_STATE = "IDLE" 
 
+# Plan Blast hasil warm-up (source message, antrian kirim, entity ter-resolve)
+BLAST_PLAN = None
+
 # Metadata Blast Realtime
 BLAST_META = {
     "total_targets": 0,
@@ -131,6 +272,9 @@ def ping():
         "app": "BabaBot Ultimate",
         "uptime": uptime_str,
         "blast_state": BLAST_STATE,
+        "connection": CONN_META,
+        "instance_id": INSTANCE_ID,
+        "is_leader": IS_LEADER,
         "server_time": datetime.utcnow().isoformat()
     }), 200
 
@@ -173,6 +317,10 @@ def dashboard():
 def blast_control():
     global BLAST_STATE, BLAST_META
     action = request.json.get('action')
+
+    # State blast hanya hidup di proses leader, kontrol dari follower tidak berefek
+    if not IS_LEADER:
+        return jsonify({"status": "error", "message": "Instance ini follower, kontrol blast hanya bisa lewat dashboard leader."})
     
     if action == 'start':
         if BLAST_STATE in ['IDLE', 'STOPPED']:
@@ -199,14 +347,18 @@ def blast_status_api():
     return jsonify({
         "state": BLAST_STATE,
         "meta": BLAST_META,
-        "broadcast_running": BROADCAST_RUNNING
+        "broadcast_running": BROADCAST_RUNNING,
+        "is_leader": IS_LEADER,
+        "instance_id": INSTANCE_ID,
+        "connection": CONN_META
     })
 
 # --- API SCAN GROUP ---
 async def fetch_telegram_dialogs():
     """Fungsi scan grup dengan penanganan error tingkat tinggi."""
     groups_data = []
-    if not client.is_connected(): await client.connect()
+    if not await wait_telegram_ready(timeout=30):
+        raise ConnectionError("Telegram sedang reconnect, coba lagi sebentar.")
     
     logger.info("🔄 Memulai Deep Scan Grup Telegram...")
     try:
@@ -232,7 +384,7 @@ async def fetch_telegram_dialogs():
                             for t in topics.topics:
                                 g_data['topics'].append({'id': t.id, 'title': t.title})
                     except Exception as e:
-                        logger.warning(f"⚠️ Gagal fetch topik untuk {entity.title}: {e}")
+                        logger.warning("⚠️ Gagal fetch topik untuk %s: %s", entity.title, e)
                 
                 groups_data.append(g_data)
     except Exception as e:
@@ -256,34 +408,36 @@ def save_bulk_targets():
         data = request.json
         selected = data.get('targets', [])
         success_count = 0
-        
+
+        # Validasi semua input dulu, jangan simpan sebagian jika ada Topic ID rusak
+        payloads = []
+        invalid = []
         for item in selected:
-            # Normalisasi Input Topic IDs
-            raw_topics = item.get('topic_ids', [])
-            topics_list = []
-            
-            if isinstance(raw_topics, list):
-                topics_list = raw_topics
-            elif isinstance(raw_topics, str) and raw_topics.strip():
-                topics_list = [t.strip() for t in raw_topics.split(',') if t.strip()]
+            try:
+                topics_list = normalize_topic_ids(item.get('topic_ids', []))
+            except ValueError as e:
+                invalid.append(f"{item.get('group_name', item.get('group_id'))}: {e}")
+                continue
 
-            topics_str = ", ".join(map(str, topics_list))
-            
-            payload = {
+            payloads.append({
                 "group_name": item['group_name'],
                 "group_id": int(item['group_id']),
-                "topic_ids": topics_str,
+                "topic_ids": topics_list,
                 "is_active": True
-            }
-            
+            })
+
+        if invalid:
+            return jsonify({"status": "error", "message": "Topic ID tidak valid → " + "; ".join(invalid)}), 400
+        
+        for payload in payloads:
             # Upsert Logic
-            exist = supabase.table('blast_targets').select('id').eq('group_id', item['group_id']).execute()
+            exist = supabase.table('blast_targets').select('id').eq('group_id', payload['group_id']).execute()
             if exist.data:
-                supabase.table('blast_targets').update(payload).eq('group_id', item['group_id']).execute()
+                supabase.table('blast_targets').update(payload).eq('group_id', payload['group_id']).execute()
             else:
                 supabase.table('blast_targets').insert(payload).execute()
             success_count += 1
-                
+
         return jsonify({"status": "success", "message": f"{success_count} Target berhasil disimpan!"})
     except Exception as e: return jsonify({"status": "error", "message": str(e)})
 
@@ -292,7 +446,7 @@ async def run_import_history_task():
     logger.info("📥 MULAI IMPORT RIWAYAT CHAT (CRM)...")
     count = 0
     try:
-        if not client.is_connected(): await client.connect()
+        await wait_telegram_ready()
         # Scan history lebih dalam (3000 dialog)
         async for dialog in client.iter_dialogs(limit=3000):
             if dialog.is_user and not dialog.entity.bot:
@@ -320,51 +474,58 @@ def import_crm_api():
     return jsonify({"status": "error", "message": "Bot belum siap."})
 
 # --- API BROADCAST (SAFE MODE) ---
-async def run_broadcast_task(message_text):
+async def run_broadcast_task(message_text, segment=None, batch_size=BROADCAST_BATCH_SIZE, batch_rest=BROADCAST_BATCH_REST_SECONDS):
     global BROADCAST_RUNNING
     BROADCAST_RUNNING = True
-    logger.info("📢 MULAI BROADCAST (Safe Mode)...")
+    segment = segment or {}
+    logger.info(f"📢 MULAI BROADCAST (Safe Mode)... Segmen: {segment or 'semua user'}")
     
     try:
-        response = supabase.table('tele_users').select("user_id, first_name").execute()
-        users = response.data
-        total_users = len(users)
+        # Segmen dievaluasi di server (Postgres), user blokir tidak ikut terambil
+        total_users = count_segment_users(segment)
         sent_count = 0
-        batch_size = 40 # Limit diturunkan sedikit agar lebih aman
+        processed = 0
         
         logger.info(f"🎯 Target Broadcast: {total_users} users")
 
-        for i in range(0, total_users, batch_size):
-            batch = users[i:i+batch_size]
-            logger.info(f"🚀 Batch {i+1} - {i+len(batch)}...")
-
-            for user in batch:
-                target_user_id = int(user['user_id'])
-                receiver_entity = await get_entity_safe(target_user_id)
+        for user in iter_segment_users(segment):
+            if not IS_LEADER:
+                logger.warning("👑 Leadership hilang, broadcast dihentikan.")
+                break
 
-                if receiver_entity:
-                    try:
-                        u_name = user.get('first_name') or "Kak"
-                        final_msg = message_text.replace("{name}", u_name)
-                        
-                        await client.send_message(receiver_entity, final_msg)
-                        sent_count += 1
-                        
-                        # Human Delay Random (Variasi lebih natural)
-                        await asyncio.sleep(random.uniform(3.0, 6.0))
-                        
-                    except errors.FloodWaitError as e:
-                        logger.warning(f"⏳ FloodWait {e.seconds}s. Tidur sebentar...")
-                        await asyncio.sleep(e.seconds + 10)
-                    except errors.UserIsBlockedError:
-                        logger.warning(f"🚫 User {target_user_id} memblokir bot.")
-                    except Exception as e:
-                        logger.error(f"❌ Gagal kirim ke {target_user_id}: {e}")
-            
             # Istirahat Panjang antar Batch
-            if i + batch_size < total_users:
-                logger.info("☕ Istirahat 2.5 menit (Anti-Ban Protocol)...")
-                await asyncio.sleep(150)
+            if processed and processed % batch_size == 0:
+                logger.info("☕ Istirahat %s detik (Anti-Ban Protocol)...", batch_rest)
+                await asyncio.sleep(batch_rest)
+            if processed % batch_size == 0:
+                logger.info("🚀 Batch %d - %d...", processed + 1, min(processed + batch_size, total_users))
+            processed += 1
+
+            target_user_id = int(user['user_id'])
+            receiver_entity = await get_entity_safe(target_user_id)
+
+            if receiver_entity:
+                try:
+                    u_name = user.get('first_name') or "Kak"
+                    final_msg = message_text.replace("{name}", u_name)
+                    
+                    await send_when_ready(receiver_entity, final_msg)
+                    sent_count += 1
+                    
+                    # Human Delay Random (Variasi lebih natural)
+                    await asyncio.sleep(random.uniform(3.0, 6.0))
+                    
+                except errors.FloodWaitError as e:
+                    logger.warning("⏳ FloodWait %ss. Tidur sebentar...", e.seconds)
+                    send_limiter.penalize(e.seconds + 10)
+                    await asyncio.sleep(e.seconds + 10)
+                except errors.UserIsBlockedError:
+                    logger.warning("🚫 User %s memblokir bot.", target_user_id)
+                    mark_user_blocked(target_user_id)
+                except SendOutcomeUnknown as e:
+                    logger.warning("❓ Status kirim ke %s tidak diketahui (tidak diulang): %s", target_user_id, e)
+                except Exception as e:
+                    logger.error("❌ Gagal kirim ke %s: %s", target_user_id, e)
 
         logger.info(f"✅ BROADCAST SELESAI. Terkirim: {sent_count}/{total_users}")
         
@@ -377,19 +538,130 @@ async def run_broadcast_task(message_text):
     finally:
         BROADCAST_RUNNING = False
 
+def parse_user_segment(form):
+    """Ambil definisi segmen broadcast dari form/query string dashboard."""
+    segment = {}
+    active_days = form.get('active_days', type=int)
+    if active_days and active_days > 0:
+        segment['active_days'] = active_days
+    if form.get('has_username') in ['1', 'true', 'on']:
+        segment['has_username'] = True
+    return segment
+
 @app.route('/start_broadcast', methods=['POST'])
 def start_broadcast():
     global BOT_LOOP, BROADCAST_RUNNING
     if BROADCAST_RUNNING: return jsonify({"status": "error", "message": "Broadcast sedang berjalan!"})
+    if not IS_LEADER: return jsonify({"status": "error", "message": "Instance ini bukan leader, broadcast hanya bisa dijalankan oleh leader."})
     
     message = request.form.get('message')
     if not message: return jsonify({"status": "error", "message": "Pesan kosong!"})
+
+    segment = parse_user_segment(request.form)
+    batch_size = max(1, request.form.get('batch_size', BROADCAST_BATCH_SIZE, type=int))
+    batch_rest = max(0, request.form.get('batch_rest', BROADCAST_BATCH_REST_SECONDS, type=int))
     
     if BOT_LOOP:
-        asyncio.run_coroutine_threadsafe(run_broadcast_task(message), BOT_LOOP)
+        asyncio.run_coroutine_threadsafe(run_broadcast_task(message, segment, batch_size, batch_rest), BOT_LOOP)
         return jsonify({"status": "success", "message": "Broadcast dimulai!"})
     return jsonify({"status": "error", "message": "Bot belum siap."})
 
+@app.route('/api/broadcast/preview')
+def broadcast_preview():
+    """Hitung jumlah user yang akan kena broadcast untuk segmen tertentu."""
+    try:
+        return jsonify({"status": "success", "count": count_segment_users(parse_user_segment(request.args))})
+    except Exception as e: return jsonify({"status": "error", "message": str(e)})
+
+# --- API BROWSING & EXPORT (LOG & CRM) ---
+def parse_log_filters(args):
+    status = (args.get('status') or '').strip().upper()
+    if status and status not in LOG_STATUS_FILTERS:
+        raise ValueError(f"Status tidak dikenal: {status} (pilihan: {', '.join(LOG_STATUS_FILTERS)})")
+    return {
+        "group_id": args.get('group_id', type=int),
+        "status": LOG_STATUS_FILTERS.get(status),
+        "date_from": args.get('date_from'),
+        "date_to": args.get('date_to')
+    }
+
+def parse_crm_filters(args):
+    segment = parse_user_segment(args)
+    blocked = args.get('blocked')
+    if blocked in ['1', 'true']: segment['blocked'] = True
+    elif blocked in ['0', 'false']: segment['blocked'] = False
+    else: segment['include_blocked'] = True
+    return segment
+
+def api_page_limit(args):
+    return min(max(1, args.get('limit', 50, type=int)), API_PAGE_LIMIT_MAX)
+
+def stream_export(rows, fmt, columns):
+    """Generator CSV/NDJSON per baris: memori konstan berapapun jumlah data."""
+    if fmt == 'ndjson':
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0); buffer.truncate()
+    yield buffer.getvalue()
+
+def export_response(rows, fmt, columns, name):
+    fmt = 'ndjson' if fmt == 'ndjson' else 'csv'
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'text/csv'
+    filename = f"{name}_{get_wib_time().strftime('%Y%m%d_%H%M')}.{fmt}"
+    return Response(stream_with_context(stream_export(rows, fmt, columns)), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+@app.route('/api/logs')
+def logs_api():
+    """Browsing blast_logs dengan cursor (keyset created_at, id)."""
+    try:
+        limit = api_page_limit(request.args)
+        filters = parse_log_filters(request.args)
+        after = decode_log_cursor(request.args.get('cursor'))
+    except ValueError as e: return jsonify({"status": "error", "message": str(e)}), 400
+    try:
+        rows = fetch_logs_page(filters, after, limit)
+        next_cursor = encode_cursor([rows[-1]['created_at'], rows[-1]['id']]) if len(rows) == limit else None
+        return jsonify({"status": "success", "data": rows, "next_cursor": next_cursor})
+    except Exception as e: return jsonify({"status": "error", "message": str(e)})
+
+@app.route('/api/crm/users')
+def crm_users_api():
+    """Browsing tele_users dengan cursor (keyset user_id)."""
+    try:
+        limit = api_page_limit(request.args)
+        cursor = decode_cursor(request.args.get('cursor'))
+        after_id = int(cursor) if cursor is not None else None
+    except (ValueError, TypeError): return jsonify({"status": "error", "message": "Cursor tidak valid."}), 400
+    try:
+        rows = fetch_users_page(parse_crm_filters(request.args), after_id, limit, columns="*")
+        next_cursor = encode_cursor(rows[-1]['user_id']) if len(rows) == limit else None
+        return jsonify({"status": "success", "data": rows, "next_cursor": next_cursor})
+    except Exception as e: return jsonify({"status": "error", "message": str(e)})
+
+@app.route('/api/logs/export')
+def logs_export():
+    columns = ["id", "created_at", "group_name", "group_id", "topic_id", "status", "error_message"]
+    try: filters = parse_log_filters(request.args)
+    except ValueError as e: return jsonify({"status": "error", "message": str(e)}), 400
+    rows = iter_logs(filters)
+    return export_response(rows, request.args.get('format'), columns, "blast_logs")
+
+@app.route('/api/crm/export')
+def crm_export():
+    columns = ["user_id", "username", "first_name", "last_interaction", "is_blocked"]
+    rows = iter_segment_users(parse_crm_filters(request.args), columns=", ".join(columns))
+    return export_response(rows, request.args.get('format'), columns, "tele_users")
+
 # --- CRUD ROUTING ---
 @app.route('/add_schedule', methods=['POST'])
 def add_schedule():
@@ -416,15 +688,138 @@ def get_wib_time():
     """Helper waktu WIB yang akurat."""
     return datetime.utcnow() + timedelta(hours=TIMEZONE_OFFSET)
 
+def normalize_topic_ids(raw):
+    """
+    Normalisasi Topic ID ke list int (kolom `topic_ids bigint[]`).
+    Menerima list atau string koma (input manual / data lama). ID rusak -> ValueError.
+    """
+    if raw is None:
+        return []
+    if isinstance(raw, str):
+        raw = [t for t in raw.split(',') if t.strip()]
+    if not isinstance(raw, (list, tuple)):
+        raise ValueError(f"format tidak dikenali ({raw!r})")
+
+    topics = []
+    bad = []
+    for t in raw:
+        value = str(t).strip()
+        if value.isdigit() and int(value) > 0:
+            topics.append(int(value))
+        else:
+            bad.append(value)
+    if bad:
+        raise ValueError(", ".join(bad))
+    return list(dict.fromkeys(topics))  # Hapus duplikat, urutan tetap
+
+def fetch_active_targets():
+    return supabase.table('blast_targets').select("*").eq('is_active', True).execute().data
+
+def targets_signature(targets):
+    """
+    Sidik target aktif (id, grup, nama, topic). Dibandingkan dengan isi DB saat jadwal tiba,
+    jadi perubahan target dari dashboard replica mana pun ikut membatalkan plan warm-up.
+    """
+    return sorted((t['id'], t['group_id'], t['group_name'], str(t.get('topic_ids'))) for t in targets)
+
+class SendRateLimiter:
+    """
+    Token Bucket untuk semua pesan keluar.
+    FloodWait dari satu jalur (blast/broadcast/reply) ikut menahan jalur lainnya.
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = None  # Dibuat di dalam loop bot (asyncio.Lock terikat ke loop)
+
+    async def acquire(self):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def penalize(self, seconds):
+        """Tahan semua pengiriman selama FloodWait berlaku."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+send_limiter = SendRateLimiter(SEND_RATE_PER_SECOND, SEND_BURST)
+
+async def wait_telegram_ready(timeout=None):
+    """Tunggu koneksi Telegram siap. Return False jika timeout."""
+    if TG_READY is None:
+        return client.is_connected()
+    if TG_READY.is_set():
+        return True
+    try:
+        await asyncio.wait_for(TG_READY.wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+class SendOutcomeUnknown(Exception):
+    """Koneksi putus setelah request terkirim: pesan mungkin sudah sampai, jangan kirim ulang."""
+
+class RequestCancelled(Exception):
+    """Future request dibatalkan Telethon saat koneksi putus (bukan task pemanggil yang di-cancel)."""
+
+async def run_request(coro):
+    """
+    Jalankan request Telethon di task terpisah.
+    CancelledError dari future request (BaseException) diubah jadi RequestCancelled,
+    sedangkan pembatalan task pemanggil (misal shutdown) tetap diteruskan apa adanya.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        await asyncio.wait({task})
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    if task.cancelled():
+        raise RequestCancelled("request dibatalkan karena koneksi terputus")
+    return task.result()
+
+async def send_when_ready(entity, message, **kwargs):
+    """
+    Kirim pesan lewat pipeline bersama (readiness + rate limiter).
+    Saat koneksi putus SEBELUM request keluar, pengiriman ditahan sampai reconnect lalu diulang.
+    Jika putus setelah request keluar, raise SendOutcomeUnknown (tidak diulang, anti double-post).
+    """
+    while True:
+        await wait_telegram_ready()
+        await send_limiter.acquire()
+        try:
+            return await run_request(client.send_message(entity, message, **kwargs))
+        except (ConnectionError, RequestCancelled, asyncio.IncompleteReadError) as e:
+            if TG_READY is not None:
+                TG_READY.clear()  # Paksa supervisor cek ulang koneksi
+            # Telethon menolak request sebelum dikirim dengan pesan ini -> aman diulang
+            if not isinstance(e, ConnectionError) or 'while disconnected' not in str(e):
+                raise SendOutcomeUnknown(str(e) or type(e).__name__) from e
+            logger.warning("🔌 Kirim ditahan, koneksi terputus: %s", e)
+            await asyncio.sleep(1)
+
 async def send_admin_report(message):
     """Mengirim pesan laporan ke Admin Bot."""
     if not SOURCE_CHAT_ID: return
     try:
         admin_entity = await get_entity_safe(SOURCE_CHAT_ID)
         if admin_entity:
-            await client.send_message(admin_entity, message)
+            await send_when_ready(admin_entity, message)
     except Exception as e:
-        logger.warning(f"Gagal lapor admin: {e}")
+        logger.warning("Gagal lapor admin: %s", e)
 
 def log_to_db(g_name, g_id, t_id, status, err=""):
     """Logger ke Database Supabase."""
@@ -439,23 +834,124 @@ def log_to_db(g_name, g_id, t_id, status, err=""):
         }
         supabase.table('blast_logs').insert(data).execute()
     except Exception as e:
-        logger.error(f"Gagal simpan log DB: {e}")
+        logger.error("Gagal simpan log DB: %s", e)
 
-async def save_user_to_db(uid, uname, fname):
-    """CRM Saver dengan Error Handling."""
+async def save_user_to_db(uid, uname, fname, unblock=False):
+    """
+    CRM Saver dengan Error Handling.
+    `unblock=True` untuk DM masuk: user yang sudah bisa chat lagi berarti tidak memblokir bot.
+    """
     try:
         res = supabase.table('tele_users').select('user_id').eq('user_id', uid).execute()
         data = {
             "user_id": uid, "username": uname, "first_name": fname,
             "last_interaction": datetime.utcnow().isoformat()
         }
+        if unblock:
+            data["is_blocked"] = False
         if res.data:
             supabase.table('tele_users').update(data).eq('user_id', uid).execute()
         else:
             supabase.table('tele_users').insert(data).execute()
-            logger.info(f"🆕 CRM: +1 User ({fname})")
+            logger.info("🆕 CRM: +1 User (%s)", fname)
     except Exception as e:
-        logger.error(f"⚠️ CRM Save Error: {e}")
+        logger.error("⚠️ CRM Save Error: %s", e)
+
+def apply_user_segment(query, segment):
+    """
+    Terapkan filter segmen CRM ke query tele_users (dievaluasi server-side).
+    User yang memblokir bot dikecualikan kecuali diminta (`include_blocked` / `blocked`).
+    """
+    if segment.get('blocked') is not None:
+        query = query.eq('is_blocked', segment['blocked'])
+    elif not segment.get('include_blocked'):
+        query = query.eq('is_blocked', False)
+    if segment.get('active_days'):
+        cutoff = (datetime.utcnow() - timedelta(days=segment['active_days'])).isoformat()
+        query = query.gte('last_interaction', cutoff)
+    if segment.get('has_username'):
+        query = query.not_.is_('username', 'null')
+    return query
+
+def count_segment_users(segment):
+    res = apply_user_segment(supabase.table('tele_users').select('user_id', count='exact'), segment).limit(1).execute()
+    return res.count or 0
+
+def fetch_users_page(segment, after_id=None, limit=DB_PAGE_SIZE, columns="user_id, first_name"):
+    """Satu halaman tele_users (keyset: user_id > after_id)."""
+    query = apply_user_segment(supabase.table('tele_users').select(columns), segment)
+    if after_id is not None:
+        query = query.gt('user_id', after_id)
+    return query.order('user_id').limit(limit).execute().data
+
+def iter_segment_users(segment, columns="user_id, first_name", page_size=DB_PAGE_SIZE):
+    """Generator user per segmen dengan keyset pagination (user_id), memori konstan."""
+    last_id = None
+    while True:
+        rows = fetch_users_page(segment, last_id, page_size, columns)
+        yield from rows
+        if len(rows) < page_size: return
+        last_id = rows[-1]['user_id']
+
+def apply_log_filters(query, filters):
+    """Filter blast_logs berdasarkan grup, status, dan rentang tanggal."""
+    if filters.get('group_id'):
+        query = query.eq('group_id', filters['group_id'])
+    if filters.get('status'):
+        # Prefix dari whitelist LOG_STATUS_FILTERS, bebas wildcard input user
+        query = query.like('status', f"{filters['status']}*")
+    if filters.get('date_from'):
+        query = query.gte('created_at', filters['date_from'])
+    if filters.get('date_to'):
+        query = query.lt('created_at', filters['date_to'])
+    return query
+
+def fetch_logs_page(filters, after=None, limit=DB_PAGE_SIZE):
+    """
+    Satu halaman blast_logs terbaru dulu.
+    Keyset (created_at, id) agar halaman berikutnya tetap cepat walau log puluhan ribu.
+    """
+    query = apply_log_filters(supabase.table('blast_logs').select("*"), filters)
+    if after:
+        c_at, c_id = after
+        query = query.or_(f'created_at.lt."{c_at}",and(created_at.eq."{c_at}",id.lt.{int(c_id)})')
+    return query.order('created_at', desc=True).order('id', desc=True).limit(limit).execute().data
+
+def iter_logs(filters, page_size=DB_PAGE_SIZE):
+    after = None
+    while True:
+        rows = fetch_logs_page(filters, after, page_size)
+        yield from rows
+        if len(rows) < page_size: return
+        after = (rows[-1]['created_at'], rows[-1]['id'])
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor):
+    if not cursor: return None
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+
+def decode_log_cursor(cursor):
+    """
+    Cursor log = [created_at, id]. Divalidasi ketat karena nilainya masuk ke filter `or` PostgREST.
+    created_at diparse lalu diserialisasi ulang, jadi karakter lain (misal tanda kutip) tidak lolos.
+    """
+    if not cursor: return None
+    try:
+        c_at, c_id = decode_cursor(cursor)
+        # fromisoformat Python < 3.11 belum menerima 'Z' & pecahan detik selain 6 digit
+        c_at = re.sub(r'\.(\d+)', lambda m: '.' + m.group(1)[:6].ljust(6, '0'), str(c_at).replace('Z', '+00:00'))
+        return datetime.fromisoformat(c_at).isoformat(), int(c_id)
+    except Exception:
+        raise ValueError("Cursor tidak valid.")
+
+def mark_user_blocked(uid):
+    """Simpan flag blokir agar user tidak ikut query broadcast berikutnya."""
+    try:
+        supabase.table('tele_users').update({"is_blocked": True}).eq('user_id', uid).execute()
+    except Exception as e:
+        logger.error("Gagal tandai user %s terblokir: %s", uid, e)
 
 async def get_entity_safe(entity_id, force_network=False):
     """
@@ -479,9 +975,97 @@ async def get_entity_safe(entity_id, force_network=False):
     try:
         if entity_id > 0: return await client.get_entity(int(f"-100{entity_id}"))
     except Exception as e:
-        logger.debug(f"Entity Resolver Failed for {entity_id}: {e}")
+        logger.debug("Entity Resolver Failed for %s: %s", entity_id, e)
         return None
 
+def try_acquire_leadership():
+    """
+    Ambil / perpanjang lease leader lewat fungsi Postgres `acquire_bot_lease`.
+    Insert + update bersyarat dalam satu statement memakai now() milik database,
+    jadi jam lokal replica yang melenceng tidak bisa merebut lease leader yang sehat.
+    Return: batas lease versi jam lokal (monotonic) atau None jika dipegang replica lain.
+    """
+    # Dihitung sebelum request: batas lokal tidak pernah melewati batas di DB
+    deadline = time.monotonic() + LEADER_LEASE_SECONDS
+    res = supabase.rpc('acquire_bot_lease', {
+        "p_name": LEADER_LEASE_NAME, "p_holder": INSTANCE_ID, "p_ttl_seconds": LEADER_LEASE_SECONDS
+    }).execute()
+    return deadline if res.data else None
+
+def claim_once(key):
+    """
+    Klaim kunci unik di tabel `bot_claims` (primary key) agar hanya satu replica yang bertindak.
+    Semua replica memakai session yang sama, jadi setiap DM diterima oleh semua replica.
+    """
+    try:
+        supabase.table('bot_claims').insert({
+            "key": key, "holder": INSTANCE_ID, "created_at": datetime.utcnow().isoformat()
+        }).execute()
+        return True
+    except Exception as e:
+        # 23505 = unique violation, kunci sudah diklaim replica lain
+        if '23505' in str(e) or 'duplicate key' in str(e):
+            return False
+        # DB tidak bisa dihubungi: tetap layani user (deploy satu replica tetap jalan)
+        logger.warning("Gagal klaim %s: %s", key, e)
+        return True
+
+def claim_schedule_slot(slot):
+    """
+    Tandai slot jadwal sudah ditembakkan (atomik di row lease).
+    Mencegah slot yang sama ditembakkan ulang oleh leader baru setelah failover.
+    """
+    try:
+        res = supabase.table('bot_leases').update({"last_fired_slot": slot}) \
+            .eq('name', LEADER_LEASE_NAME).eq('holder', INSTANCE_ID) \
+            .or_(f'last_fired_slot.is.null,last_fired_slot.neq."{slot}"') \
+            .execute()
+        return bool(res.data)
+    except Exception as e:
+        logger.error(f"Gagal klaim slot jadwal {slot}: {e}")
+        return False
+
+def telegram_down_too_long():
+    return CONN_DOWN_SINCE is not None and time.monotonic() - CONN_DOWN_SINCE > LEADER_LEASE_SECONDS
+
+def release_leadership():
+    """Kadaluarsakan lease milik instance ini sekarang juga (failover cepat)."""
+    try:
+        supabase.rpc('release_bot_lease', {"p_name": LEADER_LEASE_NAME, "p_holder": INSTANCE_ID}).execute()
+    except Exception as e:
+        logger.error("Gagal melepas lease leader: %s", e)
+
+async def leader_election_loop():
+    """Menjaga status leader instance ini (lease-based election)."""
+    global IS_LEADER, LEADER_LEASE_EXPIRES, BLAST_STATE
+    logger.info(f"👑 Leader Election Started. Instance: {INSTANCE_ID}")
+    while True:
+        try:
+            if telegram_down_too_long():
+                # Telegram mati terlalu lama: lepas lease agar follower sehat bisa ambil alih
+                if LEADER_LEASE_EXPIRES is not None:
+                    logger.warning("👑 Telegram putus > %ss, lease leader dilepas.", LEADER_LEASE_SECONDS)
+                    await asyncio.to_thread(release_leadership)
+                LEADER_LEASE_EXPIRES = None
+            else:
+                LEADER_LEASE_EXPIRES = await asyncio.to_thread(try_acquire_leadership)
+        except Exception as e:
+            logger.error("Leader Election Error: %s", e)
+            # Gagal kontak DB: tetap leader hanya sampai lease lama habis
+            if LEADER_LEASE_EXPIRES and time.monotonic() >= LEADER_LEASE_EXPIRES:
+                LEADER_LEASE_EXPIRES = None
+
+        was_leader = IS_LEADER
+        IS_LEADER = LEADER_LEASE_EXPIRES is not None
+        if IS_LEADER and not was_leader:
+            logger.info("👑 Instance ini sekarang LEADER.")
+        elif was_leader and not IS_LEADER:
+            logger.warning("👑 Leadership hilang, instance ini sekarang FOLLOWER.")
+            if BLAST_STATE in ['RUNNING', 'PAUSED']:
+                BLAST_STATE = 'STOPPED'
+
+        await asyncio.sleep(LEADER_RENEW_SECONDS)
+
 # ==========================================
 # BAGIAN 4: BACKGROUND TASKS & HEARTBEAT
 # ==========================================
@@ -489,12 +1073,16 @@ async def get_entity_safe(entity_id, force_network=False):
 async def auto_cleanup_logs():
     """Tugas pembersihan log database otomatis (Maintenance)."""
     while True:
+        if not IS_LEADER:
+            await asyncio.sleep(LEADER_RENEW_SECONDS)
+            continue
         try:
             # Hitung tanggal batas (7 hari lalu)
             cutoff_date = (datetime.utcnow() - timedelta(days=LOG_RETENTION_DAYS)).isoformat()
             
             # Hapus log lama
             supabase.table('blast_logs').delete().lt('created_at', cutoff_date).execute()
+            supabase.table('bot_claims').delete().lt('created_at', cutoff_date).execute()
             logger.info(f"🧹 Database Maintenance: Log < {LOG_RETENTION_DAYS} hari dihapus.")
             
         except Exception as e:
@@ -506,24 +1094,16 @@ async def auto_cleanup_logs():
 async def system_heartbeat():
     """
     Jantung Utama Aplikasi.
-    Melakukan ping internal dan menjaga sesi Telegram tetap hidup.
+    Melaporkan status berkala (koneksi dijaga oleh connection_supervisor).
     """
     logger.info("💓 Heartbeat Service Started.")
     while True:
         try:
             uptime = str(timedelta(seconds=int(time.time() - start_time)))
-            logger.info(f"💓 Heartbeat Tick | Uptime: {uptime} | State: {BLAST_STATE}")
-            
-            # Self-Ping Telegram (Kirim 'typing' action ke Saved Messages agar dianggap aktif)
-            if client.is_connected():
-                try:
-                    await client.send_read_acknowledge("me")
-                    # Opsional: Kirim typing action
-                    # await client(functions.messages.SetTypingRequest(
-                    #     peer=types.InputPeerSelf(),
-                    #     action=types.SendMessageTypingAction()
-                    # ))
-                except: pass
+            role = "LEADER" if IS_LEADER else "FOLLOWER"
+            conn = "UP" if CONN_META['connected'] else "DOWN"
+            logger.info(f"💓 Heartbeat Tick | Uptime: {uptime} | State: {BLAST_STATE} | Role: {role} | "
+                        f"Telegram: {conn} (reconnect: {CONN_META['reconnect_count']})")
                 
         except Exception as e:
             logger.error(f"Heartbeat Glitch: {e}")
@@ -531,16 +1111,89 @@ async def system_heartbeat():
         # Berdetak setiap 5 menit
         await asyncio.sleep(300)
 
+async def probe_telegram():
+    """Probe ringan ke server Telegram untuk memastikan koneksi benar-benar hidup."""
+    try:
+        await asyncio.wait_for(run_request(client(functions.updates.GetStateRequest())), CONN_PROBE_TIMEOUT)
+        return True
+    except Exception as e:
+        logger.warning("🔌 Probe Telegram gagal: %s", e)
+        return False
+
+async def reconnect_telegram():
+    """Reconnect dengan exponential backoff + jitter sampai berhasil."""
+    delay = 1
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            # Selama Telethon masih auto-reconnect, is_connected() tetap True: jangan diganggu
+            if not client.is_connected():
+                await client.connect()
+            # is_user_authorized() hanya nilai cache. Request high-level (seperti get_me di Telethon)
+            # wajib dikirim agar Telegram kembali push updates (DM & command admin).
+            if client.is_connected() and await probe_telegram():
+                return attempt
+        except Exception as e:
+            logger.warning("🔌 Reconnect #%d gagal: %s", attempt, e)
+        await asyncio.sleep(delay + random.uniform(0, delay / 2))
+        delay = min(delay * 2, RECONNECT_BACKOFF_MAX)
+
+async def connection_supervisor():
+    """
+    Pengawas koneksi Telegram di atas auto-reconnect Telethon.
+    Deteksi putus (event disconnected + probe berkala), reconnect dengan backoff jika Telethon
+    menyerah, dan buka/tutup TG_READY agar pipeline kirim menunggu, bukan gagal.
+    """
+    global CONN_DOWN_SINCE
+    logger.info("🔌 Connection Supervisor Started.")
+    last_probe = time.monotonic()
+    while True:
+        healthy = client.is_connected()
+        if healthy:
+            # Bangun langsung saat koneksi putus, atau setelah interval cek
+            # asyncio.wait tidak ikut raise walau future disconnected dibatalkan Telethon
+            await asyncio.wait({client.disconnected}, timeout=CONN_CHECK_SECONDS)
+            healthy = client.is_connected()
+
+        probe_due = time.monotonic() - last_probe >= CONN_PROBE_SECONDS
+        if healthy and (probe_due or not TG_READY.is_set()):
+            last_probe = time.monotonic()
+            healthy = await probe_telegram()
+
+        if healthy:
+            CONN_META['connected'] = True
+            TG_READY.set()
+            continue
+
+        # === KONEKSI PUTUS ===
+        TG_READY.clear()
+        CONN_META['connected'] = False
+        CONN_META['last_disconnect'] = datetime.now().isoformat()
+        down_since = time.monotonic()
+        CONN_DOWN_SINCE = down_since
+        logger.warning("🔌 Koneksi Telegram terputus, pipeline kirim ditahan. Reconnecting...")
+
+        attempts = await reconnect_telegram()
+        downtime = time.monotonic() - down_since
+        CONN_META['connected'] = True
+        CONN_META['reconnect_count'] += 1
+        CONN_META['last_reconnect_seconds'] = round(downtime, 2)
+        CONN_META['total_downtime_seconds'] = round(CONN_META['total_downtime_seconds'] + downtime, 2)
+        last_probe = time.monotonic()
+        CONN_DOWN_SINCE = None
+        TG_READY.set()
+        logger.info(f"🔌 Reconnected dalam {downtime:.1f}s ({attempts} percobaan). Pipeline kirim dibuka.")
+
 # ==========================================
 # BAGIAN 5: TELEGRAM BOT LOGIC (CORE)
 # ==========================================
 
 # --- ADMIN COMMANDS HANDLER (NEW FEATURE) ---
-@client.on(events.NewMessage(incoming=True, from_users=[SOURCE_CHAT_ID]))
 async def handle_admin_commands(event):
     """
     Menangani Perintah Admin via Telegram.
-    Hanya merespon pesan dari SOURCE_CHAT_ID (Admin).
+    Dipanggil dispatcher hanya untuk pesan command dari SOURCE_CHAT_ID (Admin).
     """
     global BLAST_STATE
     msg = event.message.message.strip().lower()
@@ -553,7 +1206,8 @@ async def handle_admin_commands(event):
         stats = (
             f"🤖 **BABA BOT STATUS**\n"
             f"━━━━━━━━━━━━━━━━━━\n"
-            f"🔌 Connection: `Connected`\n"
+            f"🔌 Connection: `{'Connected' if CONN_META['connected'] else 'Reconnecting'}`\n"
+            f"♻️ Reconnects: `{CONN_META['reconnect_count']}` (terakhir `{CONN_META['last_reconnect_seconds']}s`)\n"
             f"⏱ Uptime: `{uptime}`\n"
             f"📡 Blast State: `{BLAST_STATE}`\n"
             f"🎯 Success: `{BLAST_META['success_count']}`\n"
@@ -591,66 +1245,267 @@ async def handle_admin_commands(event):
         )
         await event.reply(help_text)
 
+def cache_sender(user):
+    """Simpan field pengirim yang dibutuhkan handler saja (bukan objek User utuh)."""
+    info = {
+        "id": user.id,
+        "username": getattr(user, 'username', None),
+        "first_name": getattr(user, 'first_name', None),
+        "bot": getattr(user, 'bot', False),
+        "cached_at": time.monotonic()
+    }
+    sender_cache[user.id] = info
+    sender_cache.move_to_end(user.id)
+    while len(sender_cache) > SENDER_CACHE_MAX:
+        sender_cache.popitem(last=False)
+    return info
+
+async def resolve_sender(event):
+    """
+    Ambil data pengirim tanpa network jika memungkinkan.
+    Urutan: entity bawaan update -> cache lokal (belum kadaluarsa) -> get_sender (network).
+    """
+    if event.sender is not None:
+        return cache_sender(event.sender)
+
+    info = sender_cache.get(event.sender_id)
+    if info and time.monotonic() - info['cached_at'] < SENDER_CACHE_TTL_SECONDS:
+        sender_cache.move_to_end(event.sender_id)
+        return info
+
+    sender = await event.get_sender()
+    return cache_sender(sender) if sender is not None else None
+
+# --- SINGLE DISPATCHER (ADMIN COMMAND, AUTO REPLY & CRM) ---
+# Filter private chat di level registrasi: pesan grup tidak pernah membangunkan handler.
+@client.on(events.NewMessage(incoming=True, func=lambda e: e.is_private))
+async def handle_private_message(event):
+    # 1. Admin Command (dicek dari sender_id, tanpa lookup entity)
+    # Hanya leader yang mengeksekusi: state blast hidup di proses leader
+    if event.sender_id == SOURCE_CHAT_ID and event.raw_text.startswith('/'):
+        if IS_LEADER:
+            await handle_admin_commands(event)
+        return
+
+    await handle_incoming_message(event)
+
 # --- PUBLIC MESSAGE HANDLER (AUTO REPLY & CRM) ---
-@client.on(events.NewMessage(incoming=True))
 async def handle_incoming_message(event):
-    if not event.is_private: return # Hanya private chat
+    sender = await resolve_sender(event)
+    if not sender or sender['bot']: return
     
-    sender = await event.get_sender()
-    if not sender or sender.bot: return
-    
-    sender_id = sender.id
+    sender_id = sender['id']
     now = datetime.now()
     
-    # 1. CRM Save Logic
+    # 1. Cek lokal dulu (murah): perlu update CRM? perlu auto-reply?
     should_update_db = False
     if sender_id not in user_db_cache: 
         should_update_db = True
     elif now - user_db_cache[sender_id] > timedelta(hours=DB_UPDATE_INTERVAL_HOURS): 
         should_update_db = True
-            
+
+    should_reply = auto_reply_queue is not None
+    if sender_id in last_replies:
+        if now - last_replies[sender_id] < timedelta(hours=AUTO_REPLY_DELAY_HOURS): 
+            should_reply = False
+
+    # Balasan untuk user ini sedang dikirim worker: pesan baru ikut tercakup
+    if sender_id in replying_users:
+        should_reply = False
+
+    # Coalescing: user yang sudah antri cukup diperbarui ke pesan terbarunya
+    if should_reply and sender_id in pending_replies:
+        pending_replies[sender_id] = (event, pending_replies[sender_id][1])
+        should_reply = False
+
+    if not should_update_db and not should_reply:
+        return
+
+    # 2. Satu replica per pesan. Klaim hanya saat memang ada kerja, insert dijalankan di thread
+    # agar burst DM tidak menahan event loop (blast, supervisor, lease).
+    user_db_cache[sender_id] = now
+    if not await asyncio.to_thread(claim_once, f"msg:{event.chat_id}:{event.id}"):
+        return
+
+    # 3. CRM Save Logic
     if should_update_db:
         # Jalankan di background task agar tidak blocking
-        asyncio.create_task(save_user_to_db(sender_id, sender.username, sender.first_name))
-        user_db_cache[sender_id] = now 
+        asyncio.create_task(save_user_to_db(sender_id, sender['username'], sender['first_name'], unblock=True))
 
-    # 2. Auto Reply Logic
-    # Jangan reply admin jika admin sedang nge-command
-    if sender_id == SOURCE_CHAT_ID and event.message.message.startswith('/'):
+    # 4. Auto Reply Logic (cek ulang: pesan lain user ini bisa masuk antrian selama klaim berjalan)
+    if not should_reply or sender_id in replying_users:
+        return
+    if sender_id in pending_replies:
+        pending_replies[sender_id] = (event, pending_replies[sender_id][1])
         return
 
-    if sender_id in last_replies:
-        if now - last_replies[sender_id] < timedelta(hours=AUTO_REPLY_DELAY_HOURS): 
-            return
-    
+    try:
+        auto_reply_queue.put_nowait(sender_id)
+        pending_replies[sender_id] = (event, now)
+    except asyncio.QueueFull:
+        logger.warning("📭 Antrian Auto-Reply penuh, skip user %s", sender_id)
+
+async def send_auto_reply(event, sender_id):
     # Typing Simulation
     async with client.action(sender_id, 'typing'):
         await asyncio.sleep(random.randint(2, 4))
-        
+
+    await event.reply(AUTO_REPLY_MSG, link_preview=True)
+
+async def auto_reply_worker(worker_id):
+    """Worker balasan otomatis (jumlah tetap, berbagi rate limiter dengan blast)."""
+    while True:
+        sender_id = await auto_reply_queue.get()
+        try:
+            event, queued_at = pending_replies.pop(sender_id, (None, None))
+            if event is None: continue
+            # Tandai in-flight sebelum await pertama: DM baru selama typing tidak diantrikan lagi
+            replying_users.add(sender_id)
+
+            # Buang balasan basi (misal antrian panjang setelah FloodWait)
+            if datetime.now() - queued_at > timedelta(seconds=AUTO_REPLY_STALE_SECONDS):
+                logger.info("🗑 Auto-Reply basi untuk %s, dibuang.", sender_id)
+                continue
+            if sender_id in last_replies and \
+                    datetime.now() - last_replies[sender_id] < timedelta(hours=AUTO_REPLY_DELAY_HOURS):
+                continue
+
+            # Cooldown lintas replica: satu balasan per user per jendela AUTO_REPLY_DELAY_HOURS
+            reply_window = int(time.time() // (AUTO_REPLY_DELAY_HOURS * 3600))
+            if not await asyncio.to_thread(claim_once, f"reply:{sender_id}:{reply_window}"):
+                last_replies[sender_id] = datetime.now()
+                continue
+
+            await wait_telegram_ready()
+
+            # Ambil jatah limiter sebelum typing: selama FloodWait, SetTyping juga ikut ditahan
+            await send_limiter.acquire()
+
+            await run_request(send_auto_reply(event, sender_id))
+            last_replies[sender_id] = datetime.now()
+            sender = sender_cache.get(sender_id) or {}
+            logger.info("📩 Auto-Reply: %s", sender.get('first_name') or sender_id)
+        except errors.FloodWaitError as e:
+            logger.warning("⏳ FloodWait Auto-Reply %ss", e.seconds)
+            send_limiter.penalize(e.seconds)
+        except Exception as e:
+            logger.error("Gagal Auto-Reply (worker %s): %s", worker_id, e)
+        finally:
+            replying_users.discard(sender_id)
+            auto_reply_queue.task_done()
+
+# --- BLAST PLAN (WARM-UP) ---
+async def prepare_blast_plan(slot=None):
+    """
+    Siapkan semua kebutuhan blast sebelum pesan pertama dikirim:
+    koneksi, source message, target teracak, dan entity setiap grup.
+    Return: (plan, error_message, fallback_state)
+    """
+    if SOURCE_CHAT_ID == 0 or SOURCE_MSG_ID == 0:
+        return None, "❌ Config SOURCE_CHAT_ID/MSG_ID Invalid.", 'STOPPED'
+
+    if not await wait_telegram_ready(timeout=60):
+        return None, "🔌 Telegram belum terhubung.", 'STOPPED'
+
+    source_entity = await get_entity_safe(SOURCE_CHAT_ID)
+    if not source_entity:
+        return None, "❌ Source Entity Not Found.", 'STOPPED'
+
     try:
-        await event.reply(AUTO_REPLY_MSG, link_preview=True)
-        last_replies[sender_id] = now
-        logger.info(f"📩 Auto-Reply: {sender.first_name}")
+        targets = fetch_active_targets()
     except Exception as e:
-        logger.error(f"Gagal Auto-Reply: {e}")
+        return None, f"❌ Gagal ambil target: {e}", 'STOPPED'
+    if not targets:
+        return None, "⚠️ Target Kosong.", 'IDLE'
+
+    try:
+        msg_source = await run_request(client.get_messages(source_entity, ids=SOURCE_MSG_ID))
+    except Exception as e:
+        return None, f"❌ Gagal ambil pesan sumber: {e}", 'STOPPED'
+    if not msg_source:
+        return None, "❌ Pesan Sumber Hilang/Terhapus.", 'STOPPED'
+
+    signature = targets_signature(targets)
+    random.shuffle(targets) # Randomize for safety
+
+    # Compile antrian kirim: satu entry per (grup, topic), None = chat utama grup
+    sends = []
+    for target in targets:
+        try:
+            t_ids = normalize_topic_ids(target.get('topic_ids')) or [None]
+        except ValueError as e:
+            logger.error("❌ Topic ID rusak di target %s: %s", target['group_name'], e)
+            log_to_db(target['group_name'], target['group_id'], 0, "FAILED", f"Topic ID tidak valid: {e}")
+            continue
+        sends.extend((target, t_id) for t_id in t_ids)
+
+    # Resolve semua grup di depan agar loop kirim tidak menunggu network
+    entities = {}
+    for target in targets:
+        entities[target['group_id']] = await get_entity_safe(target['group_id'])
+
+    plan = {
+        "slot": slot,
+        "source_msg": msg_source,
+        "sends": sends,
+        "entities": entities,
+        "signature": signature,
+        "prepared_at": time.monotonic()
+    }
+    return plan, None, None
+
+def is_plan_fresh(plan):
+    """Plan warm-up dipakai hanya jika belum kadaluarsa dan target di DB tidak berubah."""
+    if plan is None or time.monotonic() - plan['prepared_at'] >= BLAST_PLAN_TTL_SECONDS:
+        return False
+    try:
+        if targets_signature(fetch_active_targets()) != plan['signature']:
+            logger.info("🔥 Target berubah sejak warm-up, plan disusun ulang.")
+            return False
+    except Exception as e:
+        logger.warning("Gagal cek target plan warm-up: %s", e)
+        return False
+    return True
+
+async def prewarm_blast(slot):
+    """Warm-up beberapa menit sebelum jadwal agar blast mulai tepat waktu."""
+    global BLAST_PLAN
+    logger.info(f"🔥 Warm-up blast untuk jadwal {slot} WIB...")
+    try:
+        plan, err, _ = await prepare_blast_plan(slot)
+    except Exception as e:
+        # Jangan sampai exception warm-up ikut naik ke auto_blast_loop saat task di-await
+        plan, err = None, str(e)
+    if err:
+        logger.warning(f"🔥 Warm-up gagal ({err}), blast akan disiapkan ulang saat jadwal.")
+        return
+    BLAST_PLAN = plan
+    unresolved = sum(1 for e in plan['entities'].values() if e is None)
+    logger.info(f"🔥 Warm-up selesai: {len(plan['sends'])} kiriman siap, {unresolved} entity gagal resolve.")
+
+def next_schedule_fire(schedules, wib_now):
+    """Cari jadwal aktif terdekat (hari ini/besok) dari waktu WIB sekarang."""
+    base = wib_now.replace(second=0, microsecond=0)
+    upcoming = []
+    for s in schedules:
+        fire = base.replace(hour=s['run_hour'], minute=s['run_minute'])
+        if fire <= base: fire += timedelta(days=1)
+        upcoming.append(fire)
+    return min(upcoming) if upcoming else None
 
 # --- CORE BLAST LOOP ---
 async def auto_blast_loop():
     """
     Mesin Utama Blast dengan Logic Terpadu.
-    Menangani Jadwal, Antrian, Retry, dan State Machine.
+    Menangani Jadwal, Warm-up, Antrian, Retry, dan State Machine.
     """
-    global BLAST_STATE, BLAST_META
+    global BLAST_STATE, BLAST_META, BLAST_PLAN
     logger.info(f"🚀 Blast Engine Started. Mode: WIB (UTC+{TIMEZONE_OFFSET})")
     last_run_time_str = None
+    prewarm_task = None
+    prewarm_slot = None
     
     while True:
-        # Check Connection Integrity
-        if not client.is_connected():
-            logger.warning("🔌 Koneksi Telegram terputus, reconnecting...")
-            try: await client.connect()
-            except: pass
-
         # === SCHEDULER LOGIC ===
         wib_now = get_wib_time()
         cur_time_str = f"{wib_now.hour}:{wib_now.minute}"
@@ -665,50 +1520,55 @@ async def auto_blast_loop():
         for s in schedules:
             if s['run_hour'] == wib_now.hour and s['run_minute'] == wib_now.minute: 
                 is_scheduled = True; break
+
+        # Warm-up menjelang jadwal berikutnya (hanya leader)
+        next_fire = next_schedule_fire(schedules, wib_now)
+        seconds_to_fire = (next_fire - wib_now).total_seconds() if next_fire else None
+        if seconds_to_fire is not None and seconds_to_fire <= BLAST_PREWARM_MINUTES * 60 \
+                and IS_LEADER and BLAST_STATE == 'IDLE' and prewarm_slot != next_fire:
+            prewarm_slot = next_fire
+            prewarm_task = asyncio.create_task(prewarm_blast(next_fire.strftime('%H:%M')))
         
-        # Trigger Auto-Start by Schedule
-        if is_scheduled and cur_time_str != last_run_time_str and BLAST_STATE == 'IDLE':
+        # Trigger Auto-Start by Schedule (hanya leader)
+        if is_scheduled and IS_LEADER and cur_time_str != last_run_time_str and BLAST_STATE == 'IDLE' \
+                and claim_schedule_slot(f"{wib_now.date()}T{cur_time_str}"):
             logger.info(f"⏰ JADWAL MATCH: {cur_time_str} - Memulai Blast...")
             BLAST_STATE = 'RUNNING'
             BLAST_META['start_time'] = datetime.now().isoformat()
             last_run_time_str = cur_time_str
-            await send_admin_report(f"⏰ **Jadwal Blast Dimulai!**\nWaktu: {cur_time_str} WIB")
+            # Laporan dikirim di background agar tidak menunda pesan pertama
+            asyncio.create_task(send_admin_report(f"⏰ **Jadwal Blast Dimulai!**\nWaktu: {cur_time_str} WIB"))
             
         # === STATE MACHINE PROCESSING ===
         if BLAST_STATE == 'RUNNING':
             # 1. Pre-Flight Checks
-            if SOURCE_CHAT_ID == 0 or SOURCE_MSG_ID == 0:
-                logger.error("❌ Config SOURCE_CHAT_ID/MSG_ID Invalid.")
+            if not IS_LEADER:
+                logger.warning("👑 Bukan leader, blast tidak dijalankan.")
                 BLAST_STATE = 'STOPPED'
                 continue
-                
-            source_entity = await get_entity_safe(SOURCE_CHAT_ID)
-            if not source_entity:
-                logger.error("❌ Source Entity Not Found.")
-                BLAST_STATE = 'STOPPED'
-                continue
-                
-            targets = supabase.table('blast_targets').select("*").eq('is_active', True).execute().data
-            if not targets:
-                logger.warning("⚠️ Target Kosong.")
-                BLAST_STATE = 'IDLE'
-                continue
 
-            # 2. Prepare Meta Data
-            if BLAST_META['current_index'] == 0:
-                random.shuffle(targets) # Randomize for safety
-                BLAST_META['total_targets'] = len(targets)
+            # 2. Plan & Meta Data
+            # Pakai plan hasil warm-up jika masih segar, selain itu siapkan sekarang (cold path)
+            if BLAST_META['current_index'] == 0 or BLAST_PLAN is None:
+                if prewarm_task and not prewarm_task.done():
+                    await prewarm_task
+                if not is_plan_fresh(BLAST_PLAN):
+                    BLAST_PLAN, err, fallback_state = await prepare_blast_plan()
+                    if err:
+                        if fallback_state == 'STOPPED': logger.error(err)
+                        else: logger.warning(err)
+                        BLAST_STATE = fallback_state
+                        continue
+                BLAST_META['total_targets'] = len(BLAST_PLAN['sends'])
                 BLAST_META['success_count'] = 0
                 BLAST_META['fail_count'] = 0
-                
-            msg_source = await client.get_messages(source_entity, ids=SOURCE_MSG_ID)
-            if not msg_source:
-                logger.error("❌ Pesan Sumber Hilang/Terhapus.")
-                BLAST_STATE = 'STOPPED'
-                continue
 
-            # 3. Processing Loop
-            while BLAST_META['current_index'] < len(targets):
+            sends = BLAST_PLAN['sends']
+            entities = BLAST_PLAN['entities']
+            msg_source = BLAST_PLAN['source_msg']
+
+            # 3. Processing Loop (antrian flat hasil compile plan)
+            while BLAST_META['current_index'] < len(sends):
                 
                 # Dynamic Control Check
                 if BLAST_STATE == 'PAUSED':
@@ -716,72 +1576,79 @@ async def auto_blast_loop():
                     continue
                 if BLAST_STATE == 'STOPPED':
                     break 
+
+                # Health Gate: tahan antrian selama koneksi putus
+                if not await wait_telegram_ready(timeout=2):
+                    BLAST_META['current_group'] = "⏳ Menunggu koneksi Telegram..."
+                    continue
                 
-                target = targets[BLAST_META['current_index']]
+                target, t_id = sends[BLAST_META['current_index']]
                 BLAST_META['current_group'] = target['group_name']
-                
-                # Parse Topics
-                raw_topics = target.get('topic_ids', '')
-                t_ids = [int(x.strip()) for x in raw_topics.split(',') if x.strip().isdigit()] if raw_topics else [None]
                 target_group_id = target['group_id']
+                BLAST_META['current_index'] += 1
 
-                # Topic Loop
-                for t_id in t_ids:
-                    while BLAST_STATE == 'PAUSED': await asyncio.sleep(1)
-                    if BLAST_STATE == 'STOPPED': break
-
-                    # Entity Resolution
+                # Entity Resolution (sudah di-cache saat warm-up)
+                target_entity = entities.get(target_group_id)
+                if target_entity is None:
                     target_entity = await get_entity_safe(target_group_id)
+                    entities[target_group_id] = target_entity
 
-                    if not target_entity:
-                        log_to_db(target['group_name'], target_group_id, 0, "FAILED", "Invalid Entity")
-                        BLAST_META['fail_count'] += 1
-                        continue
+                if not target_entity:
+                    log_to_db(target['group_name'], target_group_id, 0, "FAILED", "Invalid Entity")
+                    BLAST_META['fail_count'] += 1
+                    continue
 
-                    try:
-                        # SENDING ACTION
-                        await client.send_message(
-                            target_entity, 
-                            msg_source, 
-                            reply_to=t_id
-                        )
-                        
-                        log_to_db(target['group_name'], target['group_id'], t_id, "SUCCESS")
-                        BLAST_META['success_count'] += 1
-                        logger.info(f"✅ Sent: {target['group_name']}")
-                        
-                        # Smart Delay (45s - 90s)
-                        await asyncio.sleep(random.randint(45, 90))
-                        
-                    except errors.FloodWaitError as e:
-                        logger.warning(f"⏳ FloodWait: {e.seconds}s")
-                        log_to_db(target['group_name'], target['group_id'], t_id, "FLOODWAIT", f"Wait {e.seconds}s")
-                        await asyncio.sleep(e.seconds + 5)
+                try:
+                    # SENDING ACTION
+                    await send_when_ready(
+                        target_entity, 
+                        msg_source, 
+                        reply_to=t_id
+                    )
+                    
+                    log_to_db(target['group_name'], target['group_id'], t_id, "SUCCESS")
+                    BLAST_META['success_count'] += 1
+                    logger.info("✅ Sent: %s", target['group_name'])
+                    
+                    # Smart Delay (45s - 90s)
+                    await asyncio.sleep(random.randint(45, 90))
+                    
+                except errors.FloodWaitError as e:
+                    logger.warning("⏳ FloodWait: %ss", e.seconds)
+                    log_to_db(target['group_name'], target['group_id'], t_id, "FLOODWAIT", f"Wait {e.seconds}s")
+                    send_limiter.penalize(e.seconds + 5)
+                    await asyncio.sleep(e.seconds + 5)
+
+                except SendOutcomeUnknown as e:
+                    logger.warning("❓ Status kirim ke %s tidak diketahui (tidak diulang): %s", target['group_name'], e)
+                    log_to_db(target['group_name'], target_group_id, t_id, "UNKNOWN", str(e))
 
-                    except Exception as e:
-                        err_str = str(e)
-                        
-                        # Smart Retry Strategy
-                        if "Invalid Peer" in err_str or "PEER_ID_INVALID" in err_str:
-                            logger.info("🔄 Retry with Force Network Fetch...")
-                            fresh_entity = await get_entity_safe(target_group_id, force_network=True)
-                            if fresh_entity:
-                                try:
-                                    await client.send_message(fresh_entity, msg_source, reply_to=t_id)
-                                    log_to_db(target['group_name'], target_group_id, t_id, "SUCCESS (RETRY)")
-                                    BLAST_META['success_count'] += 1
-                                except Exception as e2:
-                                    log_to_db(target['group_name'], target['group_id'], t_id, "FAILED", str(e2))
-                                    BLAST_META['fail_count'] += 1
-                            else:
+                except Exception as e:
+                    err_str = str(e)
+                    
+                    # Smart Retry Strategy
+                    if "Invalid Peer" in err_str or "PEER_ID_INVALID" in err_str:
+                        logger.info("🔄 Retry with Force Network Fetch...")
+                        fresh_entity = await get_entity_safe(target_group_id, force_network=True)
+                        entities[target_group_id] = fresh_entity
+                        if fresh_entity:
+                            try:
+                                await send_when_ready(fresh_entity, msg_source, reply_to=t_id)
+                                log_to_db(target['group_name'], target_group_id, t_id, "SUCCESS (RETRY)")
+                                BLAST_META['success_count'] += 1
+                            except SendOutcomeUnknown as e2:
+                                log_to_db(target['group_name'], target_group_id, t_id, "UNKNOWN", str(e2))
+                            except Exception as e2:
+                                log_to_db(target['group_name'], target['group_id'], t_id, "FAILED", str(e2))
                                 BLAST_META['fail_count'] += 1
                         else:
-                            log_to_db(target['group_name'], target['group_id'], t_id, "FAILED", err_str)
                             BLAST_META['fail_count'] += 1
-
-                BLAST_META['current_index'] += 1
+                    else:
+                        log_to_db(target['group_name'], target['group_id'], t_id, "FAILED", err_str)
+                        BLAST_META['fail_count'] += 1
             
             # 4. Finish Handling
+            BLAST_PLAN = None
             if BLAST_STATE == 'STOPPED':
                 logger.info("🛑 Blast Stopped by User.")
                 BLAST_META['current_index'] = 0
@@ -802,11 +1669,15 @@ async def auto_blast_loop():
                 
         elif BLAST_STATE == 'STOPPED':
             BLAST_META['current_index'] = 0
+            BLAST_PLAN = None
             BLAST_STATE = 'IDLE'
         
-        # Idle Tick
+        # Idle Tick (bangun tepat di menit jadwal berikutnya)
         if BLAST_STATE == 'IDLE':
-             await asyncio.sleep(20)
+             idle_sleep = 20
+             if next_fire:
+                 idle_sleep = max(0.5, min(idle_sleep, (next_fire - get_wib_time()).total_seconds()))
+             await asyncio.sleep(idle_sleep)
         else:
              await asyncio.sleep(1)
 
@@ -815,16 +1686,24 @@ async def auto_blast_loop():
 # ==========================================
 
 async def start_bot():
-    global BOT_LOOP
+    global BOT_LOOP, auto_reply_queue, TG_READY
     BOT_LOOP = asyncio.get_running_loop()
+    auto_reply_queue = asyncio.Queue(maxsize=AUTO_REPLY_QUEUE_SIZE)
+    TG_READY = asyncio.Event()
     
     try:
         await client.start()
         logger.info("✅ TELEGRAM CLIENT CONNECTED & AUTHORIZED")
+        CONN_META['connected'] = True
+        TG_READY.set()
         
         # Jalankan Background Service
+        asyncio.create_task(connection_supervisor()) # Reconnect & Health Gate
+        asyncio.create_task(leader_election_loop()) # Multi Replica
         asyncio.create_task(system_heartbeat())    # Anti-Tidur
         asyncio.create_task(auto_cleanup_logs())   # Database Cleaner
+        for i in range(AUTO_REPLY_WORKERS):        # Auto-Reply Worker Pool
+            asyncio.create_task(auto_reply_worker(i))
         
         if SOURCE_CHAT_ID:
             await send_admin_report("🖥 **Bot System Online**\nVersi: Ultimate Edition\nStatus: Ready")